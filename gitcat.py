@@ -115,14 +115,20 @@ PARTICULAR PURPOSE.  See the GNU General Public License for more details.
 #     then reread it
 
 import argparse
+import ast
+import json
 import os
 import re
 import shutil
 import signal
 import subprocess
 import sys
+import tempfile
 import textwrap
+import threading
+import time
 
+from concurrent.futures import ThreadPoolExecutor
 from difflib import get_close_matches
 
 try:
@@ -132,6 +138,13 @@ try:
 except ImportError:
     argcomplete = False
 
+try:
+    # use libgit2, rather than git, for some read-only queries if pygit2 is available
+    import pygit2
+
+except ImportError:
+    pygit2 = False
+
 # ---------------------------------------------------------------------------
 import socket
 REMOTE_SERVER = "www.google.com"
@@ -149,16 +162,16 @@ def connected_to_internet(hostname=REMOTE_SERVER):
      pass
   return False
 
-# compiled regular expressions
+# the user's home directory, which is the default prefix for the repositories
+HOME = os.path.expanduser('~')
 
-# [ahead 1], or [behind 1] or [ahead # 2, behind 1] in status
-ahead_behind = re.compile(r'\[((ahead|behind) [0-9]+(, )?)+\]')
+# default number of threads used when processing repositories in parallel
+MAX_WORKERS = min(32, 2 * (os.cpu_count() or 1))
 
-# list of files that have changed
-files_changed = re.compile(r'([0-9]+ file(?:s|))(?: changed)')
+# compiled regular expressions
 
 # section in an ini file
-ini_section = re.compile(r'^\[([-a-zA-Z]*)\]$')
+ini_section = re.compile(r'\[([-a-zA-Z]*)\]$')
 
 
 # ---------------------------------------------------------------------------
@@ -172,30 +185,26 @@ class Settings(dict):
     def __init__(self, ini_file, git_options_file):
         super().__init__()
 
-        self.prefix = os.environ['HOME']
+        self.prefix = HOME
         self.quiet = False      # defaults
         self.dry_run = False
 
         # store a dictionary of aliases for the git cat command
         self.command_alias = {}
 
-        # location of the gitcatrc file defaults to $XDG_CONFIG_HOME/config/gitcatrc
-        # and then to ~/.gitcatrc
-        self.rc_file = os.path.expanduser('~/.gitcatrc')
-        try:
-            xdg = os.environ['XDG_CONFIG_HOME']
-            if os.path.isdir(xdg):
-                os.makedirs(os.path.join(xdg, 'config'), exist_ok = True)
-                self.rc_file = os.path.join(xdg, 'config', 'gitcatrc')
+        # location of the gitcatrc file, which is only found when needed
+        self._rc_file = None
 
-        except (KeyError, IOError):
-            pass
+        # cache of the output of `git cat status --cached`
+        self.status_cache_file = os.path.join(HOME, '.gitcat-cache.json')
 
         # read gitcat ini file, which gives data about gitcat
+        self.git_defaults = {}
         self.read_ini_file(ini_file)
 
         self.commands = {}
         self.read_git_options(git_options_file)
+        self.set_command_aliases()
 
         # save the default options
         self.default_options = {}  # will hold non-standard git defaults
@@ -205,6 +214,50 @@ class Settings(dict):
                 if 'default' in self.commands[cmd][option]:
                     self.default_options[cmd][option] = self.commands[cmd][option]['default']
 
+    @property
+    def rc_file(self):
+        r'''
+        Return the location of the gitcatrc file, which defaults to
+        $XDG_CONFIG_HOME/config/gitcatrc and then to ~/.gitcatrc
+        '''
+        if self._rc_file is None:
+            self._rc_file = os.path.join(HOME, '.gitcatrc')
+            try:
+                xdg = os.environ['XDG_CONFIG_HOME']
+                if os.path.isdir(xdg):
+                    os.makedirs(os.path.join(xdg, 'config'), exist_ok = True)
+                    self._rc_file = os.path.join(xdg, 'config', 'gitcatrc')
+
+            except (KeyError, IOError):
+                pass
+
+        return self._rc_file
+
+    def set_command_aliases(self):
+        r'''
+        Set `self.command_alias`, which maps the aliases of each command to
+        the command. Any command can be shortened to its first three, or more,
+        letters, except when the shortened name is shared by several commands.
+        '''
+        prefixes = {}
+        for cmd in self.commands:
+            for c in range(3, len(cmd)):
+                prefixes.setdefault(cmd[:c], []).append(cmd)
+
+        self.command_alias = {alias: cmds[0] for alias, cmds in prefixes.items() if len(cmds) == 1}
+        for cmd in self.commands:
+            if 'alias' in self.commands[cmd]:
+                self.command_alias[self.commands[cmd]['alias']] = cmd
+
+    def command(self, name):
+        r'''
+        Return the command called `name`, or with alias `name`, or `None` if
+        there is no such command.
+        '''
+        if name in self.commands:
+            return name
+        return self.command_alias.get(name)
+
     @staticmethod
     def doc_string(cmd):
         '''
@@ -213,19 +266,17 @@ class Settings(dict):
         '''
         return textwrap.dedent(getattr(GitCat, cmd.replace('-','_')).__doc__)
 
-    def add_git_options(self, commands):
+    def add_git_options(self, commands, only=None):
         '''
-        Generate all of the `git cat` command options as parsers of `commands`
+        Generate all of the `git cat` command options as parsers of `commands`.
+        If `only` is given then only the parser for this command is generated.
         '''
-        for cmd in self.commands:
-            aliases = [ self.commands[cmd]['alias'] ] if 'alias' in self.commands[cmd] else []
-            for c in range(3, len(cmd)):
-                #self.command_alias[cmd[:c]] = cmd
-                aliases.append(cmd[:c])
+        for cmd in self.commands if only is None else [only]:
+            aliases = [alias for alias in self.command_alias if self.command_alias[alias] == cmd]
 
             command = commands.add_parser(
                 cmd,
-                aliases=aliases.copy(),
+                aliases=aliases,
                 help=self.commands[cmd]['description'],
                 description=self.commands[cmd]['description'],
                 formatter_class=argparse.RawTextHelpFormatter,
@@ -269,7 +320,8 @@ class Settings(dict):
         '''
         with open(ini_file, 'r') as ini:
             for line in ini:
-                key, val = [w.strip() for w in line.split('=')]
+                key, _, val = line.partition('=')
+                key, val = key.strip(), val.strip()
                 if key != '':
                     if '.' in key:
                         command, option = key.split('.')
@@ -282,13 +334,34 @@ class Settings(dict):
     # list options that are not passed to git
     special_options = ['alias', 'description']
 
+    # types and constants that can be given to options in the git options file
+    option_types = {'int': int, 'float': float, 'str': str}
+    option_constants = {'True': True, 'False': False, 'None': None}
+
+    @classmethod
+    def option_value(cls, value):
+        r'''
+        Return the python value of `value` from the git options file. The
+        common cases are looked up directly, then python literals, such as
+        lists and quoted strings, are parsed. Anything else is returned as a
+        string.
+        '''
+        if value in cls.option_constants:
+            return cls.option_constants[value]
+        if value.isdigit():
+            return int(value)
+        try:
+            return ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return value
+
     def read_git_options(self, options_file):
         '''
         Read and store the information in the command-line options file
         '''
         with open(options_file, 'r') as options:
             for line in options:
-                match = ini_section.search(line.strip())
+                match = ini_section.match(line.strip())
                 if match:
                     # line is an ini section of the form: [command]
                     # set command and initialise to an empty dictionary
@@ -308,10 +381,7 @@ class Settings(dict):
                             opt = opt[1:]
                             option['short-option'] = None
 
-                        try:
-                            option['default'] = eval(default)
-                        except (NameError, SyntaxError, TypeError):
-                            option['default'] = default.strip()
+                        option['default'] = self.option_value(default)
                         if isinstance(option['default'], bool):
                             option['action'] = 'store_{}'.format(str(not option['default']).lower())
                         if isinstance(option['default'], str):
@@ -325,10 +395,10 @@ class Settings(dict):
                         if choices[0] in self.special_options:
                             self.commands[command][choices[0]] = choices[1]
                         else:
-                            try:
-                                self.commands[command][opt][choices[0]] = eval(choices[1])
-                            except (NameError, SyntaxError, TypeError, KeyError):
-                                self.commands[command][opt][choices[0]] = choices[1]
+                            if choices[0] == 'type' and choices[1] in self.option_types:
+                                self.commands[command][opt]['type'] = self.option_types[choices[1]]
+                            else:
+                                self.commands[command][opt][choices[0]] = self.option_value(choices[1])
                     else:
                         error_message(f'syntax error in {options_file} on the line\n {line}')
 
@@ -337,7 +407,7 @@ class Settings(dict):
         Return a string for setting the non-standard settings in the gitcatrc file
         '''
         save_settings = ''
-        if self.prefix != os.environ['HOME']:
+        if self.prefix != HOME:
             save_settings += f'prefix = {self.prefix}\n'
 
         if save_settings !='':
@@ -350,7 +420,25 @@ class Settings(dict):
 
 
 file = lambda f: os.path.join(os.path.dirname(__file__), f)
-settings = Settings(file('gitcat.ini'), file('git-options.ini'))
+_settings = None
+
+def get_settings():
+    r'''
+    Return the gitcat settings. The ini files are only read the first time
+    that the settings are needed, rather than when gitcat is imported.
+    '''
+    global _settings
+    if _settings is None:
+        _settings = Settings(file('gitcat.ini'), file('git-options.ini'))
+    return _settings
+
+def __getattr__(name):
+    r'''
+    Provide `gitcat.settings`, which is used by setup.py, on demand
+    '''
+    if name == 'settings':
+        return get_settings()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
 # ---------------------------------------------------------------------------
@@ -371,7 +459,7 @@ def error_message(err):
 
 def debugging(message):
     """ print a debugging message if `debugging` is true"""
-    if settings.DEBUGGING:
+    if Settings.DEBUGGING:
         print(message)
 
 
@@ -393,50 +481,67 @@ class Git:
     Container class for running a git command and printing an
     error message if necessary.
 
-    Usage: Git(rep, command, options)
+    Usage: Git(rep, command, *options, cwd=cwd, capture=capture, report=report)
 
     where
      - rep     is the key for the repository being processed
      - command is the main git command being run
      - options are the options to the git commend
+     - cwd     is the directory that the git command is run in
+     - capture is `False` if the standard output of the command is not needed
+     - report  is `False` if errors are expected and should not be reported
+
+    The git command is run directly, rather than through a shell, so each
+    option should be a separate argument.
 
     The class that is return has attributes:
      - rep        the catalogue key for the respeoctory
      - returncode the return code from the subprocess command
      - output     the stdout and stderr output from the subprocess command
+     - stdout     the unprocessed stdout output from the subprocess command
     """
 
-    def __init__(self, gitcat, rep, command, options=''):
+    def __init__(self, gitcat, rep, command, *options, cwd=None, capture=True, report=True):
         """ run a git command and wrap the return values for later use """
-        git = subprocess.run(f'git {command} {options}'.strip(), shell=True, capture_output=True)
+        # stderr is always captured so that errors can be reported, and git
+        # never reads from the terminal as many commands run in parallel
+        git = subprocess.run(['git', command, *options],
+                             stdin=subprocess.DEVNULL,
+                             stdout=subprocess.PIPE if capture else subprocess.DEVNULL,
+                             stderr=subprocess.PIPE,
+                             cwd=cwd,
+                             encoding='utf-8',
+                             errors='replace')
+        if not capture:
+            git.stdout = ''
 
         # store the output
         self.rep = rep
         self.returncode = git.returncode
-        self.command = command + ' ' + options
+        self.command = ' '.join([command, *options])
+        self.stdout = git.stdout
 
-        if self.returncode != 0:
+        if self.returncode != 0 and not report:
+            self.git_command_ok = False
+        elif self.returncode != 0:
             if rep not in gitcat.problems:
                 gitcat.problems.append(rep)
-            self.error_message = '{}: there was an error using git {} {}\n  {}\n'.format(
-                rep,
-                command,
-                options,
-                git.stderr.decode().strip().replace('\n', '\n  ').replace(
-                    '\r', '\n  '),
-            )
-            print(self.error_message)
-            debugging('{line}{err}{line}'.format(line='-' * 40, err=self.error_message))
+            stderr = git.stderr.strip().replace('\n', '\n  ').replace('\r', '\n  ')
+            self.error_message = f'{rep}: there was an error using git {self.command}\n  {stderr}\n'
+            gitcat.echo(self.error_message)
+            debugging(f'{"-" * 40}{self.error_message}{"-" * 40}')
             self.git_command_ok = False
         else:
             self.git_command_ok = True
 
-        # output is indented two spaces and has no blank lines
-        self.output = '\n'.join('  ' + lin.strip() for lin in (
-            git.stdout.decode().replace('\r', '\n').strip().split('\n') +
-            git.stderr.decode().replace('\r', '\n').strip().split('\n'))
-                                if lin != '')
-        debugging(f'{self}\nstdout={git.stdout}\nstderr={git.stderr}')
+        # output is indented two spaces and has no blank lines. Most git
+        # commands print nothing on success, so skip the empty streams
+        self.output = '\n'.join('  ' + lin.strip()
+                                for stream in (git.stdout, git.stderr) if stream
+                                for lin in stream.replace('\r', '\n').split('\n')
+                                if lin.strip() != '')
+        if Settings.DEBUGGING:
+            debugging(f'{self}\nstdout={git.stdout}\nstderr={git.stderr}')
 
     def __bool__(self):
         ''' return 'self.is_ok` '''
@@ -444,13 +549,9 @@ class Git:
 
     def __repr__(self):
         """ define a __repr__ method for debugging """
-        return 'Git({})\n  rep={}, OK={}, returncode={}\n  output={}.'.format(
-            self.command,
-            self.rep,
-            self.git_command_ok,
-            self.returncode,
-            self.output.replace('\n', '\n  '),
-        )
+        output = self.output.replace('\n', '\n  ')
+        return (f'Git({self.command})\n  rep={self.rep}, OK={self.git_command_ok}, '
+                f'returncode={self.returncode}\n  output={output}.')
 
 
 # ---------------------------------------------------------------------------
@@ -469,12 +570,22 @@ class GitCat:
     """
 
     def __init__(self, options, settings):
-        self.gitcatrc = options.catalogue
+        self.gitcatrc = options.catalogue or settings.rc_file
+        self.settings = settings
         self.options = options
         self.prefix = options.prefix
         self.problems = []
+        self.git_repositories = {}  # cache of the results of is_git_repository
+        self.expanded_paths = {}    # cache of the results of expand_path
+        self.short_paths = {}       # cache of the results of short_path
+        self.selected_repositories = None  # cache of the results of repositories
+        self.updated_repositories = []     # repositories changed by commit, pull or push
 
-        debugging(f'{options=}')
+        # output from worker threads is buffered in a thread local list
+        self._buffer = threading.local()
+
+        if Settings.DEBUGGING:
+            debugging(f'{options=}')
 
         for opt in ['dry_run', 'quiet']:
             setattr(self, opt, getattr(settings, opt))
@@ -491,27 +602,18 @@ class GitCat:
             self.move(options.moveto)
             sys.exit()
 
-        # run corresponding command - but allow short hands
-        command = options.command.replace('-','_')
-        bad_command = True
-        try:
-            getattr(self, command)()
-            bad_command = False
-
-        except AttributeError:
-            try:
-                getattr(self, settings.command_alias[command])()
-            except KeyError:
-                # should not ever reach this branch as argparse should give
-                # a usage error first
-                pass
-
-        except Exception as err:
-            raise
-            error_message(f'unknown error: {err}')
+        # run corresponding command - but allow short hands. Only the
+        # commands in git-options.ini can be run
+        command = settings.command(options.command)
+        if command is None:
+            # should not ever reach this branch as argparse should give
+            # a usage error first
+            error_message(f'unrecognised command: {options.command}')
+        getattr(self, command.replace('-', '_'))()
 
-        if bad_command:
-            error_message(f'unrecognised command: {command}')
+        # the cached status of any repository that has been changed is stale
+        if self.updated_repositories:
+            self.forget_status(self.updated_repositories)
 
         # print a list of any problem repositories at the end
         if len(self.problems) == 1:
@@ -522,33 +624,41 @@ class GitCat:
             print(f' - {sep.join(red_text(p) for p in self.problems)}')
 
 
-    def git(self, *args):
+    def git(self, rep, command, *options, cwd=None, capture=True, report=True):
         '''
-        Call git using the Git class
+        Call git using the Git class. Unless `cwd` is given, the git command
+        is run in the directory of the repository `rep`. If `report` is
+        `False` then errors are not printed or recorded as problems.
         '''
-        return Git(self, *args)
+        return Git(self, rep, command, *options,
+                   cwd=self.expand_path(rep) if cwd is None else cwd,
+                   capture=capture, report=report)
 
     def changed_files(self, rep):
         r'''
-        Return list of files repository in the current directory that have
-        changed.  We assume that we are in a git repository.
+        Return list of files in the repository `rep` that have changed.  We
+        assume that `rep` is a git repository. The file names in the `stdout`
+        of the returned Git() record are separated by null characters.
         '''
-        return self.git(rep, 'diff-index', '--name-only HEAD')
+        return self.git(rep, 'diff-index', '-z', '--name-only', 'HEAD')
 
     def commit_repository(self, rep):
         r'''
-        Commit the files in the repository in current working directory.
+        Commit the files in the repository `rep`.
         The commit message is a list of the files being changed. Return
         the Git() record of the commit.
         '''
         debugging('\nCOMMIT rep=' + rep)
         changed_files = self.changed_files(rep)
-        if changed_files and changed_files.output != '':
-            commit_message = 'git cat: updating ' + changed_files.output
-            options = f'--all --message="{commit_message}"'
+        if changed_files and changed_files.stdout != '':
+            commit_message = 'git cat: updating ' + ' '.join(changed_files.stdout.split('\0')[:-1])
+            options = ['--all', f'--message={commit_message}']
             if self.dry_run:
-                options += ' --porcelain' # implies --dry-run
-            return self.git(rep, 'commit', options)
+                options.append('--porcelain') # implies --dry-run
+            commit = self.git(rep, 'commit', *options)
+            if commit and not self.dry_run:
+                self.updated_repositories.append(self.expand_path(rep))
+            return commit
 
         return changed_files
 
@@ -566,9 +676,11 @@ class GitCat:
     def expand_path(self, dire):
         r'''
         Return the path to the directory `dire`, adding `self.prefix` if
-        necessary.
+        necessary. The results are cached in `self.expanded_paths`.
         '''
-        return dire if dire.startswith('/') else os.path.join(self.prefix, dire)
+        if dire not in self.expanded_paths:
+            self.expanded_paths[dire] = dire if dire.startswith('/') else os.path.join(self.prefix, dire)
+        return self.expanded_paths[dire]
 
     def get_current_git_root(self):
         r'''
@@ -581,43 +693,59 @@ class GitCat:
             dire = self.short_path(os.getcwd())
         dire = self.expand_path(dire)
 
-        if not (os.path.isdir(dire) and self.is_git_repository(dire)):
+        if not os.path.isdir(dire):
             error_message(f'{dire} not a git repository')
 
-        # find the root directory for the repository and the remote URL`
-        os.chdir(dire)
-        root = self.git(dire, 'root')
+        # find the root directory for the repository, which also checks that
+        # dire is inside a git repository
+        root = self.git(dire, 'rev-parse', '--show-toplevel')
         if not root:
             error_message(f'{dire} is not a git repository:\n  {root.output}')
-        return root
+        return root.output.strip()
 
     def is_git_repository(self, dire):
         r'''
-        Return `True` if `dire` is a git repository and `False` otherwise. As
-        part of testing for a repository the current working directory is also
-        changed to `dire`.
+        Return `True` if `dire` is a git repository and `False` otherwise.
+        The answer is cached because repositories do not come and go while git
+        cat is running.
         '''
-        debugging(f'\nCHECKING for git dire={dire}')
-        if os.path.isdir(dire):
-            os.chdir(dire)
-            rep = dire.replace(self.prefix + '/', '')
-            is_git = self.git(rep, 'rev-parse', '--is-inside-work-tree')
-            return is_git.returncode == 0 and 'true' in is_git.output
-
-        return False
+        if dire not in self.git_repositories:
+            debugging(f'\nCHECKING for git dire={dire}')
+            is_git = False
+            if os.path.exists(os.path.join(dire, '.git')):
+                # the usual case, which does not need a git process. For
+                # worktrees and submodules .git is a file rather than a directory
+                is_git = True
+            elif os.path.isdir(dire) and pygit2:
+                # libgit2 finds the repository without starting a git process
+                git_dir = pygit2.discover_repository(dire)
+                is_git = git_dir is not None and not pygit2.Repository(git_dir).is_bare
+            elif os.path.isdir(dire):
+                rep = dire.replace(self.prefix + '/', '')
+                is_git = self.git(rep, 'rev-parse', '--is-inside-work-tree', cwd=dire, report=False)
+                is_git = is_git.returncode == 0 and 'true' in is_git.output
+            self.git_repositories[dire] = is_git
+
+        return self.git_repositories[dire]
 
     def list_catalogue(self, listing):
         r'''
         Return a string that lists the repositories in the catalogue. If
         `listing` is `False` and the repository does not exist then the
         separator is an exclamation mark, otherwise it is an equals sign.
+        When `listing` is `True` the whole catalogue is listed, ignoring any
+        filter, as this is used to save the catalogue.
         '''
-        return '\n'.join('{dire:<{max}} {sep} {rep}'.format(
-            dire=dire,
-            rep=self.catalogue[dire],
-            sep='=' if listing or self.
-            is_git_repository(self.expand_path(dire)) else '!',
-            max=self.max) for dire in self.repositories())
+        if listing:
+            width = max(map(len, self.catalogue), default=-1) + 1
+            return '\n'.join(f'{dire:<{width}} = {self.catalogue[dire]}' for dire in self.catalogue)
+
+        width = self.max
+        lines = []
+        for dire in self.repositories():
+            sep = '=' if self.is_git_repository(self.expand_path(dire)) else '!'
+            lines.append(f'{dire:<{width}} {sep} {self.catalogue[dire]}')
+        return '\n'.join(lines)
 
     def move(self, position):
         r'''
@@ -630,10 +758,10 @@ class GitCat:
         moves the current repository to the end of the catalogue.
         '''
         dire = self.get_current_git_root()
-        rep = self.git(dire, 'remote', 'get-url --push origin')
+        rep = self.git(dire, 'remote', 'get-url', '--push', 'origin')
         if not rep:
             error_message(f'Unable to find remote repository for {dire}')
-        dire = self.short_path(dire.output.strip())
+        dire = self.short_path(dire)
         if dire in self.catalogue:
             # as is usual in python, negatives count backwards
             if position<0:
@@ -654,27 +782,28 @@ class GitCat:
                         self.catalogue[reps[pos+delta]] = cat[reps[pos+delta]]
                     if pos == dire_pos:
                         delta = 1 if position>dire_pos else 0
+                self.selected_repositories = None
                 self.save_catalogue()
         else:
             error_message(f'The git repository {dire} is not in the catalogue')
 
-    def process_options(self, default_options=''):
+    def process_options(self, *default_options):
         r'''
-           Set the command line options starting with `default_options` and
-           then checking the command list options against the list of options
-           in `options_list`
+           Return the list of command line options starting with
+           `default_options` and then checking the command list options
+           against the list of options in `options_list`
         '''
-        options = default_options
+        options = list(default_options)
         for option in vars(self.options):
             if option.startswith('git_'):
                 opt = option[4:].replace('_', '-')
                 val = getattr(self.options, option)
                 if val is True:
-                    options += ' --' + opt
+                    options.append('--' + opt)
                 elif isinstance(val, list):
-                    options += ' --{}={}'.format(opt, ','.join(val))
+                    options.append(f'--{opt}={",".join(val)}')
                 elif isinstance(val, str):
-                    options += ' --{}={}'.format(opt, val)
+                    options.append(f'--{opt}={val}')
                 else:
                     debugging(f'option {option}={val} ignored')
         return options
@@ -700,103 +829,307 @@ class GitCat:
             reading_settings = True
             with open(self.gitcatrc, 'r') as catalogue:
                 for line in catalogue:
-                    if line.strip() == 'Catalogue:':
-                        reading_settings = False
-
-                    if ' = ' in line:
-                        dire, rep = line.split(' = ')
-                        dire = dire.strip()
-                        rep = rep.strip()
-                        if reading_settings:
-                            if hasattr(self, dire):
-                                setattr(self, dire, rep)
-                            elif hasattr(self.options, dire):
-                                setattr(self.options, dire, rep)
-                            else:
-                                self.message(f'bad setting "{dire}" in gitcatrc file')
-
+                    dire, sep, rep = line.partition(' = ')
+                    if not sep:
+                        if line.strip() == 'Catalogue:':
+                            reading_settings = False
+                        continue
+
+                    dire = dire.strip()
+                    rep = rep.strip()
+                    if reading_settings:
+                        if hasattr(self, dire):
+                            setattr(self, dire, rep)
+                        elif hasattr(self.options, dire):
+                            setattr(self.options, dire, rep)
                         else:
-                            if dire in self.catalogue:
-                                error_message(f'{dire} appears in the catalogue more than once!')
-                            else:
-                                self.catalogue[dire] = rep.strip()
+                            self.message(f'bad setting "{dire}" in gitcatrc file')
+
+                    elif dire in self.catalogue:
+                        error_message(f'{dire} appears in the catalogue more than once!')
+                    else:
+                        self.catalogue[dire] = rep
 
         except (FileNotFoundError, OSError):
             error_message(f'there was a problem reading the catalogue file {self.gitcatrc}')
 
         # set the maximum length of a catalogue key
+        self.max = max(map(len, self.repositories()), default=-1) + 1
+
+    def read_status_cache(self):
+        r'''
+        Read the cached output of `git cat status` into `self.status_cache`,
+        which is a dictionary with the repository directories as keys
+        '''
+        try:
+            with open(self.settings.status_cache_file, 'r') as cache:
+                self.status_cache = json.load(cache)
+        except (OSError, ValueError):
+            self.status_cache = {}
+
+    def save_status_cache(self):
+        r'''
+        Save `self.status_cache`, ignoring any errors because the cache is
+        only an optimisation
+        '''
+        try:
+            with open(self.settings.status_cache_file, 'w') as cache:
+                json.dump(self.status_cache, cache)
+        except OSError:
+            debugging(f'unable to write {self.settings.status_cache_file}')
+
+    def git_directories(self, dire):
+        r'''
+        Return the git directory of the repository `dire` and its common git
+        directory, which contains the branches, or `None` if these cannot be
+        found. The two directories are the same except for linked worktrees.
+        For worktrees and submodules `.git` is a file whose `gitdir:` line
+        gives the location of the git directory.
+        '''
+        git_dir = os.path.join(dire, '.git')
+        if os.path.isfile(git_dir):
+            try:
+                with open(git_dir, 'r') as gitfile:
+                    gitdir, sep, path = gitfile.readline().partition(':')
+            except OSError:
+                return None
+            if gitdir != 'gitdir' or not sep:
+                return None
+            # relative paths are relative to dire
+            git_dir = os.path.normpath(os.path.join(dire, path.strip()))
+
+        common_dir = git_dir
+        try:
+            with open(os.path.join(git_dir, 'commondir'), 'r') as commondir:
+                common_dir = os.path.normpath(os.path.join(git_dir, commondir.readline().strip()))
+        except OSError:
+            pass
+        return git_dir, common_dir
+
+    def forget_status(self, directories):
+        r'''
+        Remove the repository directories in `directories` from the cache of
+        `git cat status --cached`, which is only rewritten if it changes.
+        '''
+        self.read_status_cache()
+        forgotten = [self.status_cache.pop(dire) for dire in directories if dire in self.status_cache]
+        if forgotten:
+            self.save_status_cache()
+
+    def repository_state(self, dire):
+        r'''
+        Return a list of the modification times of the git directory of the
+        repository `dire`, of its index and HEAD, of the packed-refs file and
+        of all of the directories of local and remote branches, including
+        nested ones like `refs/heads/feature`, together with the sizes of the
+        index and packed-refs and the contents of HEAD, or `None` if these
+        cannot be found. Git replaces the index, HEAD and the branch
+        references using renames, so this list changes whenever any of these
+        are updated.
+        '''
+        directories = self.git_directories(dire)
+        if directories is None:
+            return None
+        git_dir, common_dir = directories
+
+        paths = [git_dir, os.path.join(git_dir, 'HEAD')]
+        for refs in ('heads', 'remotes'):
+            for root, _, _ in os.walk(os.path.join(common_dir, 'refs', refs)):
+                paths.append(root)
+        try:
+            state = [os.stat(path).st_mtime_ns for path in paths]
+        except OSError:
+            return None
+
+        # the index and packed-refs do not exist in new repositories. The size
+        # of the index is included in case its modification time is coarse
+        for path in (os.path.join(git_dir, 'index'), os.path.join(common_dir, 'packed-refs')):
+            try:
+                stat = os.stat(path)
+                state.extend([stat.st_mtime_ns, stat.st_size])
+            except OSError:
+                state.extend([None, None])
+
+        # HEAD names the current branch, or the commit when it is detached
         try:
-            self.max = max(len(dire) for dire in self.repositories()) + 1
-        except ValueError:
-            self.max = 0
+            with open(os.path.join(git_dir, 'HEAD'), 'r') as head:
+                state.append(head.read().strip())
+        except OSError:
+            return None
+        return state
 
     def save_catalogue(self):
         r'''
-        Save the catalogue of git repositories to sync
+        Save the catalogue of git repositories to sync. The gitcatrc file is
+        only written if it changes, and it is replaced in one step so that it
+        is never left half written.
         '''
-        with open(self.gitcatrc, 'w') as catalogue:
-            catalogue.write('# List of git repositories to sync using gitcat\n')
-            catalogue.write('# Do not remove the "Catalogue:" line below!\n')
-            catalogue.write(settings.save_settings())
-            catalogue.write('Catalogue:\n'+self.list_catalogue(listing=True) + '\n')
+        contents = ('# List of git repositories to sync using gitcat\n'
+                    '# Do not remove the "Catalogue:" line below!\n'
+                    + self.settings.save_settings()
+                    + 'Catalogue:\n' + self.list_catalogue(listing=True) + '\n')
+        try:
+            with open(self.gitcatrc, 'r') as catalogue:
+                if catalogue.read() == contents:
+                    return
+        except OSError:
+            pass
+
+        # replace the file that gitcatrc points to, rather than a symbolic link
+        gitcatrc = os.path.realpath(self.gitcatrc)
+        catalogue = tempfile.NamedTemporaryFile('w', dir=os.path.dirname(gitcatrc),
+                                                prefix='.gitcatrc-', delete=False)
+        try:
+            with catalogue:
+                catalogue.write(contents)
+            if os.path.exists(gitcatrc):
+                shutil.copymode(gitcatrc, catalogue.name)
+            os.replace(catalogue.name, gitcatrc)
+        except BaseException:
+            # do not leave the temporary file behind
+            os.remove(catalogue.name)
+            raise
 
     def short_path(self, dire):
         r'''
         Return the shortened path to the directory `dire` obtained by removing `self.prefix`
-        if necessary.
+        if necessary. The results are cached in `self.short_paths`.
+        '''
+        if dire not in self.short_paths:
+            # only remove whole directories, so /home/abc is not inside /home/a
+            prefix = self.prefix.rstrip('/') + '/'
+            debugging(f'prefix = {prefix}.')
+            debugging(f'dire = {dire}, prefixed={dire.startswith(prefix)}')
+            self.short_paths[dire] = dire[len(prefix):] if dire.startswith(prefix) else dire
+        return self.short_paths[dire]
+
+    def recently_fetched(self, dire):
+        r'''
+        Return `True` if the remotes of the repository `dire` were fetched
+        less than `self.options.max_fetch_age` seconds ago. Git updates
+        .git/FETCH_HEAD every time that it fetches.
+        '''
+        try:
+            fetched = os.path.getmtime(os.path.join(dire, '.git', 'FETCH_HEAD'))
+        except OSError:
+            return False
+        return time.time() - fetched < self.options.max_fetch_age
+
+    def remove_directory(self, dire):
+        r'''
+        Delete the directory `dire` and everything in it. The files are
+        removed in parallel, which is much faster than `shutil.rmtree` for
+        repositories containing many small files, and then the directories
+        are removed from the bottom up. If anything goes wrong then we fall
+        back to `shutil.rmtree`.
         '''
-        debugging(f'prefix = {self.prefix}.'.format(self.prefix))
-        debugging(f'dire = {dire}, prefixed={dire.startswith(self.prefix)}')
+        files = []
+        directories = []
+        for root, subdirs, names in os.walk(dire, topdown=False):
+            files.extend(os.path.join(root, name) for name in names)
+            for subdir in subdirs:
+                # symbolic links to directories are removed, not followed
+                path = os.path.join(root, subdir)
+                (files if os.path.islink(path) else directories).append(path)
+        directories.append(dire)
 
-        return dire[len(self.prefix) + 1:] if dire.startswith(
-            self.prefix) else dire
+        try:
+            with ThreadPoolExecutor(max_workers=self.options.jobs) as executor:
+                list(executor.map(os.unlink, files))
+            for directory in directories:
+                os.rmdir(directory)
+        except OSError:
+            if os.path.exists(dire):
+                shutil.rmtree(dire)
 
     def repositories(self):
         ''' return the list of repositories to iterate over by
             filtering by options.repositories
         '''
-        # if there is no filter then return the catalogue keys
-        if not hasattr(self.options, 'repositories'):
-            return self.catalogue.keys()
-
-        repositories = re.compile(self.options.repositories)
-        return filter(repositories.search, self.catalogue.keys())
+        # the list is cached until the catalogue changes
+        if self.selected_repositories is None:
+            if not hasattr(self.options, 'repositories'):
+                # if there is no filter then use the catalogue keys
+                self.selected_repositories = list(self.catalogue)
+            else:
+                repositories = re.compile(self.options.repositories)
+                self.selected_repositories = [rep for rep in self.catalogue if repositories.search(rep)]
+
+        return self.selected_repositories
+
+    def run_in_parallel(self, task):
+        r'''
+        Run `task(rep)` for each of the selected repositories using a pool of
+        `self.options.jobs` threads. The output from each task is buffered and
+        then printed from the main thread, in catalogue order, as the tasks
+        finish.
+        '''
+        def buffered_task(rep):
+            self._buffer.output = []
+            try:
+                task(rep)
+                return ''.join(self._buffer.output)
+            finally:
+                self._buffer.output = None
+
+        with ThreadPoolExecutor(max_workers=self.options.jobs) as executor:
+            for output in executor.map(buffered_task, self.repositories()):
+                # each repository's output is written in one go, and flushed so
+                # that progress is visible while the remaining tasks run
+                if output:
+                    sys.stdout.write(output)
+                    sys.stdout.flush()
+
+        # problems are recorded as the tasks finish, so restore catalogue order
+        order = {rep: pos for pos, rep in enumerate(self.catalogue)}
+        self.problems.sort(key=lambda rep: order.get(rep, len(order)))
 
     # ---------------------------------------------------------------------------
     # messages
     # ---------------------------------------------------------------------------
 
+    def echo(self, message, ending=None):
+        r'''
+        Print `message` to stdout, with `ending` as the ending. Inside the
+        worker threads of `run_in_parallel` the message is buffered so that it
+        can be printed later by the main thread.
+        '''
+        buffer = getattr(self._buffer, 'output', None)
+        if buffer is None:
+            print(message, end=ending)
+        else:
+            buffer.append(message + ('\n' if ending is None else ending))
+
     def message(self, message, ending=None):
         r'''
-        If `self.quiet` is `True` then print `message` to stdout, with `ending`
-        as the, well, ending. If `self.quiet` is `False` then do nothing.
+        If `self.quiet` is `False` then print `message` to stdout, with `ending`
+        as the, well, ending. If `self.quiet` is `True` then do nothing.
         '''
         if not self.quiet:
             debugging('-' * 40)
-            print(message, end=ending)
+            self.echo(message, ending)
             debugging('-' * 40)
 
     def quiet_message(self, message, ending=None):
         r'''
-        If `self.quiet` is `False` then print `message` to stdout, with `ending`
-        as the, well, ending. If `self.quiet` is `True` then do nothing.
+        If `self.quiet` is `True` then print `message` to stdout, with `ending`
+        as the, well, ending. If `self.quiet` is `False` then do nothing.
         '''
         if self.quiet:
             debugging('-' * 40)
-            print(message, end=ending)
+            self.echo(message, ending)
             debugging('-' * 40)
 
     def rep_message(self, rep, message='', quiet=True, ending=None):
         r'''
-        If `self.quiet` is `True` then print `message` to stdout, with `ending`
-        as the, well, ending. If `self.quiet` is `False` then do nothing.
+        Print `message` for the repository `rep` to stdout, with `ending` as
+        the ending, unless both `quiet` and `self.quiet` are `True`.
         '''
-        debugging(
-            'rep message: quiet={}, self.quiet={} and quietness={}\n{}'.format(
-                quiet, self.quiet, not (quiet and self.quiet), '-' * 40))
+        if Settings.DEBUGGING:
+            debugging(f'rep message: quiet={quiet}, self.quiet={self.quiet} and '
+                      f'quietness={not (quiet and self.quiet)}\n{"-" * 40}')
         if not (quiet and self.quiet):
-            print('{:<{max}} {}'.format(rep, message, max=self.max),
-                  end=ending)
+            self.echo(f'{rep:<{self.max}} {message}', ending)
             debugging('-' * 40)
 
     # ---------------------------------------------------------------------------
@@ -818,11 +1151,11 @@ class GitCat:
         '''
         dire = self.get_current_git_root()
 
-        rep = self.git(dire, 'remote', 'get-url --push origin')
+        rep = self.git(dire, 'remote', 'get-url', '--push', 'origin')
         if not rep:
             error_message(f'Unable to find remote repository for {dire}')
 
-        dire = self.short_path(dire.output.strip())
+        dire = self.short_path(dire)
         rep = rep.output.strip()
         if dire in self.catalogue:
             # give an error if repository is already in the catalogue
@@ -830,6 +1163,7 @@ class GitCat:
         else:
             # add current directory to the repository and save
             self.catalogue[dire] = rep
+            self.selected_repositories = None
             self.save_catalogue()
             self.message(f'Adding {dire} to the catalogue')
 
@@ -837,7 +1171,7 @@ class GitCat:
             # add a commit message
             catdir = os.path.dirname(self.gitcatrc)
             if self.is_git_repository(catdir):
-                self.git(dire, 'commit', '--all --message="{}"'.format(f'Adding {dire} to gitcatrc'))
+                self.git(dire, 'commit', '--all', f'--message=Adding {dire} to gitcatrc', cwd=catdir, capture=False)
 
     def branch(self):
         r'''
@@ -855,7 +1189,7 @@ class GitCat:
             Code/Project4        already up to date
             Code/Project5
               branch1 14fc541 Adding braid method to tableau
-              * branch2       68480a4 git cat: updating   doc/README.rst
+              * branch2       68480a4 git cat: updating doc/README.rst
               master             862e2f4 Adding good stuff
             Code/Project6            already up to date
 
@@ -864,20 +1198,26 @@ class GitCat:
 
             # need to use -q to stop output being printed to stderr, but then we
             # have to work harder to extract information about the pull
-            options = self.process_options('--verbose')
-            for rep in self.repositories():
-                debugging('\nBRANCH ' + rep)
-                dire = self.expand_path(rep)
-                if self.is_git_repository(dire):
-                    pull = self.git(rep, 'branch', options)
-                    if pull:
-                        if '\n' not in pull.output:
-                            self.rep_message(rep, 'already up to date')
-                        else:
-                            self.rep_message(rep,
-                                             pull.output[pull.output.index('\n'):])
+            self.branch_options = self.process_options('--verbose')
+            self.run_in_parallel(self.branch_one)
+
+    def branch_one(self, rep):
+        r'''
+        Print the status of the branches in the repository `rep`
+        '''
+        debugging('\nBRANCH ' + rep)
+        dire = self.expand_path(rep)
+        if self.is_git_repository(dire):
+            pull = self.git(rep, 'branch', *self.branch_options)
+            if pull:
+                # only the branches after the first line are printed
+                _, sep, others = pull.output.partition('\n')
+                if not sep:
+                    self.rep_message(rep, 'already up to date')
                 else:
-                    self.rep_message(rep, 'not on system')
+                    self.rep_message(rep, sep + others)
+        else:
+            self.rep_message(rep, 'not on system')
 
     def list(self):
         r'''
@@ -908,12 +1248,16 @@ class GitCat:
             > git cat commit
         '''
         if self.connected_to_internet('commit repositories'):
+            self.run_in_parallel(self.commit_one)
 
-            for rep in self.repositories():
-                debugging('\nCOMMITTING ' + rep)
-                dire = self.expand_path(rep)
-                if self.is_git_repository(dire):
-                    self.commit_repository(rep)
+    def commit_one(self, rep):
+        r'''
+        Commit all changes in the repository `rep`
+        '''
+        debugging('\nCOMMITTING ' + rep)
+        dire = self.expand_path(rep)
+        if self.is_git_repository(dire):
+            self.commit_repository(rep)
 
     def diff(self):
         r'''
@@ -935,18 +1279,23 @@ class GitCat:
         '''
         if self.connected_to_internet('diff repositories'):
 
-            options = self.process_options()
-            options += ' HEAD'
-            for rep in self.repositories():
-                debugging('\nDIFFING ' + rep)
-                dire = self.expand_path(rep)
-                if self.is_git_repository(dire):
-                    diff = self.git(rep, 'diff', options)
-                    if diff:
-                        if diff.output != '':
-                            self.rep_message(rep, diff.output.lstrip(), quiet=False)
-                        else:
-                            self.rep_message(rep, 'up to date')
+            self.diff_options = self.process_options()
+            self.diff_options.append('HEAD')
+            self.run_in_parallel(self.diff_one)
+
+    def diff_one(self, rep):
+        r'''
+        Run git diff on the repository `rep`
+        '''
+        debugging('\nDIFFING ' + rep)
+        dire = self.expand_path(rep)
+        if self.is_git_repository(dire):
+            diff = self.git(rep, 'diff', *self.diff_options)
+            if diff:
+                if diff.output != '':
+                    self.rep_message(rep, diff.output.lstrip(), quiet=False)
+                else:
+                    self.rep_message(rep, 'up to date')
 
     def fetch(self):
         r'''
@@ -967,19 +1316,24 @@ class GitCat:
         if self.connected_to_internet('fetch repositories'):
             # need to use -q to stop output being printed to stderr, but then we
             # have to work harder to extract information about the pull
-            options = self.process_options('-q --progress')
-            for rep in self.repositories():
-                debugging('\nFETCHING ' + rep)
-                dire = self.expand_path(rep)
-                if self.is_git_repository(dire):
-                    pull = self.git(rep, 'fetch', options)
-                    if pull:
-                        if pull.output == '':
-                            self.rep_message(rep, 'already up to date')
-                        else:
-                            self.rep_message(rep, pull.output.lstrip())
+            self.fetch_options = self.process_options('-q', '--progress')
+            self.run_in_parallel(self.fetch_one)
+
+    def fetch_one(self, rep):
+        r'''
+        Fetch the repository `rep` from its remote repositories
+        '''
+        debugging('\nFETCHING ' + rep)
+        dire = self.expand_path(rep)
+        if self.is_git_repository(dire):
+            pull = self.git(rep, 'fetch', *self.fetch_options)
+            if pull:
+                if pull.output == '':
+                    self.rep_message(rep, 'already up to date')
                 else:
-                    self.rep_message(rep, 'not on system')
+                    self.rep_message(rep, pull.output.lstrip())
+        else:
+            self.rep_message(rep, 'not on system')
 
     def install(self):
         r'''
@@ -992,6 +1346,9 @@ class GitCat:
         regular expression for the repositories you can install a subset of the
         repositories managed by git cat.abs
 
+        The repositories are cloned in parallel. With the `--shallow` option
+        only the most recent commit of each repository is cloned.
+
         Examples:
 
             > git cat install       # install all repositories managed by git cat
@@ -999,37 +1356,51 @@ class GitCat:
         '''
         if self.connected_to_internet('install new repositories'):
 
-            installed_something = False
-            for rep in self.repositories():
-                debugging('\nINSTALLING ' + rep)
-                dire = self.expand_path(rep)
-                if os.path.exists(dire):
-                    if os.path.exists(os.path.join(dire, '.git')):
-                        self.rep_message(f'git repository {dire} already exists')
-                    else:
-                        # initialise current repository and fetch from remote
-                        self.git(rep, 'init')
-                        self.git(rep, f'remote add origin {self.catalogue[rep]}')
-                        self.git(rep, 'fetch origin')
-                        self.git(rep, 'checkout -b master --track origin/master')
-                        installed_something = True
+            # options for fetching and cloning, noting that git fetch does
+            # not accept --single-branch
+            if self.options.shallow:
+                self.install_fetch_options = ['--depth=1']
+                self.install_clone_options = ['--depth=1', '--single-branch']
+            else:
+                self.install_fetch_options = self.install_clone_options = []
 
-                else:
-                    self.rep_message(rep, 'installing')
-                    parent = os.path.dirname(dire)
-                    os.makedirs(parent, exist_ok=True)
-                    os.chdir(parent)
-                    if not self.dry_run:
-                        install = self.git(rep, 'clone', f'--quiet {self.catalogue[rep]} {os.path.basename(dire)}')
-                        if install:
-                            installed_something = True
-                            self.message(' - done!')
-                if not (self.dry_run or self.is_git_repository(dire)):
-                    self.rep_message(rep, f'{rep} is not a git repository!?', quiet=False)
-
-            if not installed_something:
+            self.installed_something = False
+            self.run_in_parallel(self.install_one)
+
+            if not self.installed_something:
                 error_message('No matching repositories found to install')
 
+    def install_one(self, rep):
+        r'''
+        Install the repository `rep` from the catalogue
+        '''
+        debugging('\nINSTALLING ' + rep)
+        dire = self.expand_path(rep)
+        if os.path.exists(dire):
+            if os.path.exists(os.path.join(dire, '.git')):
+                self.rep_message(f'git repository {dire} already exists')
+            else:
+                # initialise current repository and fetch from remote
+                self.git(rep, 'init', capture=False)
+                self.git(rep, 'remote', 'add', 'origin', self.catalogue[rep], capture=False)
+                self.git(rep, 'fetch', *self.install_fetch_options, 'origin', capture=False)
+                self.git(rep, 'checkout', '-b', 'master', '--track', 'origin/master', capture=False)
+                self.installed_something = True
+
+        else:
+            self.rep_message(rep, 'installing')
+            parent = os.path.dirname(dire)
+            os.makedirs(parent, exist_ok=True)
+            if not self.dry_run:
+                install = self.git(rep, 'clone', '--quiet', *self.install_clone_options,
+                                   self.catalogue[rep], os.path.basename(dire),
+                                   cwd=parent, capture=False)
+                if install:
+                    self.installed_something = True
+                    self.message(' - done!')
+        if not (self.dry_run or self.is_git_repository(dire)):
+            self.rep_message(rep, f'{rep} is not a git repository!?', quiet=False)
+
     def pull(self):
         r'''
         Run through all repositories and update them if their directories
@@ -1051,24 +1422,30 @@ class GitCat:
 
             # need to use -q to stop output being printed to stderr, but then we
             # have to work harder to extract information about the pull
-            options = self.process_options('-q --progress')
-            for rep in self.repositories():
-                debugging('\nPULLING ' + rep)
-                dire = self.expand_path(rep)
-                if self.is_git_repository(dire):
-                    pull = self.git(rep, 'pull', options)
-                    if pull:
-                        if pull.output == '':
-                            self.rep_message(rep, 'already up to date')
-                        else:
-                            self.rep_message(
-                                rep,
-                                'pulling\n' + '\n'.join(
-                                    lin for lin in pull.output.split('\n')
-                                    if 'Compressing' not in lin),
-                                quiet=False)
+            self.pull_options = self.process_options('-q', '--progress')
+            self.run_in_parallel(self.pull_one)
+
+    def pull_one(self, rep):
+        r'''
+        Pull the repository `rep` from its remote repository
+        '''
+        debugging('\nPULLING ' + rep)
+        dire = self.expand_path(rep)
+        if self.is_git_repository(dire):
+            pull = self.git(rep, 'pull', *self.pull_options)
+            if pull:
+                self.updated_repositories.append(dire)
+                if pull.output == '':
+                    self.rep_message(rep, 'already up to date')
                 else:
-                    self.rep_message(rep, 'repository not installed')
+                    self.rep_message(
+                        rep,
+                        'pulling\n' + '\n'.join(
+                            lin for lin in pull.output.split('\n')
+                            if 'Compressing' not in lin),
+                        quiet=False)
+        else:
+            self.rep_message(rep, 'repository not installed')
 
     def push(self):
         r'''
@@ -1088,7 +1465,7 @@ class GitCat:
             Code/Project3  up to date
             Code/Project4  up to date
             Code/GitCat    commit
-              [master 442822d] git cat: updating   gitcat.py
+              [master 442822d] git cat: updating gitcat.py
               1 file changed, 44 insertions(+), 5 deletions(-)
               To bitbucket.org:AndrewsBucket/gitcat.git
               refs/heads/master:refs/heads/master	6ffeb9d..442822d
@@ -1098,38 +1475,44 @@ class GitCat:
         '''
         if self.connected_to_internet('push repositories'):
             debugging('\nPUSHING ')
-            options = self.process_options('--porcelain --follow-tags')
-            for rep in self.repositories():
-                debugging('\nPUSHING ' + rep)
-                dire = self.expand_path(rep)
-                if self.is_git_repository(dire):
-                    debugging('Continuing with push')
-                    commit = self.commit_repository(rep)
-                    if commit:
-                        if commit.output != '':
-                            self.rep_message(rep, 'commit\n' + commit.output)
-                        ahead = self.git(rep, 'for-each-ref', r'--format="%(refname:short) %(upstream:track)" refs/heads')
-                        if ahead:
-                            if 'ahead' not in ahead.output:
+            self.push_options = self.process_options('--porcelain', '--follow-tags')
+            self.run_in_parallel(self.push_one)
+
+    def push_one(self, rep):
+        r'''
+        Commit any local changes to the repository `rep` and then push it to
+        its remote repository
+        '''
+        debugging('\nPUSHING ' + rep)
+        dire = self.expand_path(rep)
+        if self.is_git_repository(dire):
+            debugging('Continuing with push')
+            commit = self.commit_repository(rep)
+            if commit:
+                if commit.output != '':
+                    self.rep_message(rep, 'commit\n' + commit.output)
+                ahead = self.git(rep, 'for-each-ref', '--format=%(refname:short) %(upstream:track)', 'refs/heads')
+                if ahead:
+                    if 'ahead' not in ahead.output:
+                        self.rep_message(rep, 'up to date')
+                    elif not self.dry_run:
+                        push = self.git(rep, 'push', *self.push_options)
+
+                        if push:
+                            self.updated_repositories.append(dire)
+                            # with --porcelain, each ref is reported on a tab
+                            # separated line whose flag is '=' if it was up to date
+                            if all(line.startswith('=') for line in push.stdout.splitlines() if '\t' in line):
                                 self.rep_message(rep, 'up to date')
-                            elif not self.dry_run:
-                                push = self.git(rep, 'push', options)
-
-                                if push:
-                                    if push.output.startswith('  To ') and push.output.endswith('Done'):
-                                        if commit.output == '' and 'up to date' not in commit.output:
-                                            self.rep_message(rep, 'pushed\n' + push.output)
-                                        else:
-                                            self.message(
-                                                push.output.split('\n')[0])
-                                    else:
-                                        if commit.output == '' and 'up to date' not in commit.output:
-                                            self.rep_message(rep, 'pushed\n' + push.output)
-                                        else:
-                                            self.message(push.output)
+                            elif commit.output == '':
+                                self.rep_message(rep, 'pushed\n' + push.output)
+                            elif push.output.startswith('  To ') and push.output.endswith('Done'):
+                                self.message(push.output.split('\n')[0])
+                            else:
+                                self.message(push.output)
 
-                else:
-                    self.rep_message(rep, 'not on system')
+        else:
+            self.rep_message(rep, 'not on system')
 
     def remote_set_ssh(self):
         r'''
@@ -1152,32 +1535,36 @@ class GitCat:
             Code/Project3  unchanged
         '''
         if self.connected_to_internet('change ssh settings'):
+            self.run_in_parallel(self.remote_set_ssh_one)
 
-            for rep in self.repositories():
-                debugging('\nCONVERT-TO-SSH ' + rep)
-                dire = self.expand_path(rep)
-                if self.is_git_repository(dire):
-                    remote = self.git(rep, 'remote', '-v')
-                    changed = [] # avoid duplicates by keeping a list of remotes that have already been changed
-                    if remote:
-                        if 'https://' in remote.output:
-                            # remotes will be repeating triples that look something like:
-                            # 'origin', 'https://AndrewsBucket@bitbucket.org/AndrewsBucket/webquiz.git', '(fetch)'
-                            remotes = remote.output.split()
-                            r=0
-                            while r+1<len(remotes):
-                                https = remotes[r+1] # a https string as above
-                                if remotes[r] not in changed and '@' in https:
-                                    ssh = 'git'+https[https.index('@'):].replace('/',':',1)
-                                    changing = self.git(rep, 'remote', f'set-url {remotes[r]} {ssh}')
-                                    if changing:
-                                        self.rep_message(rep, 'changed to ssh access')
-                                        changed.append(remotes[r])
-                                r += 3
-                        else:
-                            self.rep_message(rep, 'unchanged')
+    def remote_set_ssh_one(self, rep):
+        r'''
+        Change the remote URLs of the repository `rep` to use ssh access
+        '''
+        debugging('\nCONVERT-TO-SSH ' + rep)
+        dire = self.expand_path(rep)
+        if self.is_git_repository(dire):
+            remote = self.git(rep, 'remote', '-v')
+            changed = [] # avoid duplicates by keeping a list of remotes that have already been changed
+            if remote:
+                if 'https://' in remote.output:
+                    # remotes will be repeating triples that look something like:
+                    # 'origin', 'https://AndrewsBucket@bitbucket.org/AndrewsBucket/webquiz.git', '(fetch)'
+                    remotes = remote.output.split()
+                    r=0
+                    while r+1<len(remotes):
+                        https = remotes[r+1] # a https string as above
+                        if remotes[r] not in changed and '@' in https:
+                            ssh = 'git'+https[https.index('@'):].replace('/',':',1)
+                            changing = self.git(rep, 'remote', 'set-url', remotes[r], ssh, capture=False)
+                            if changing:
+                                self.rep_message(rep, 'changed to ssh access')
+                                changed.append(remotes[r])
+                        r += 3
                 else:
-                    self.rep_message(rep, 'not on system')
+                    self.rep_message(rep, 'unchanged')
+        else:
+            self.rep_message(rep, 'not on system')
 
     def remove(self):
         r'''
@@ -1191,29 +1578,30 @@ class GitCat:
 
         '''
         dire = self.get_current_git_root()
-        rep = self.git(dire, 'remote', 'get-url --push origin')
+        rep = self.git(dire, 'remote', 'get-url', '--push', 'origin')
 
         if not rep:
             error_message(f'Unable to find remote repository for {dire}')
 
-        dire = self.short_path(dire.output.strip())
+        dire = self.short_path(dire)
         if dire not in self.catalogue:
             error_message(f'unknown repository {dire}')
 
         del self.catalogue[dire]
+        self.selected_repositories = None
         self.message(f'Removing {dire} from the catalogue')
         self.save_catalogue()
 
         if self.options.git_everything:
             # remove directory
             self.message(f'Removing directory {dire}')
-            shutil.rmtree(dire)
+            self.remove_directory(self.expand_path(dire))
 
             # check to see if the gitcatrc is in a git repository and, if so,
             # add a commit message
             catdir = os.path.dirname(self.gitcatrc)
             if self.is_git_repository(catdir):
-                self.git(dire, 'commit', '--all --message "{}"'.format(f'Removing {dire} from gitcatrc'))
+                self.git(dire, 'commit', '--all', f'--message=Removing {dire} from gitcatrc', cwd=catdir, capture=False)
 
     def status(self):
         r'''
@@ -1223,6 +1611,16 @@ class GitCat:
         remote repositories to determine whether each repository is ahead or
         behind the remote repository.
 
+        With the `--local` option the remote repositories are not queried, so
+        the status is only compared with the last fetch from the remotes.
+
+        With the `--cached` option, the status of a repository is reused from
+        the previous `git cat status --cached` if git has not changed its
+        index or branches since then, and the cached status is discarded when
+        git cat commits, pulls or pushes the repository. Changes to files
+        that have not been added to the index are not noticed when the cached
+        status is used.
+
         Example:
             > git cat status Code
             Code/Project1  up to date
@@ -1236,54 +1634,125 @@ class GitCat:
         '''
         if self.connected_to_internet('check status'):
 
-            status_options = self.process_options('--porcelain --short --branch')
-            diff_options = '--shortstat --no-color'
-
-            for rep in self.repositories():
-                debugging(f'\nSTATUS for {rep}')
-                dire = self.expand_path(rep)
-                if self.is_git_repository(dire):
-
-                    # update with remote, unless local is true
-                    remote = self.options.git_local or self.git(rep, 'remote', 'update')
-
-                    if remote:
-                        # use status to work out relative changes
-                        status = self.git(rep, 'status', status_options)
-                        if status:
-                            changes = ahead_behind.search(status.output)
-                            changes = '' if changes is None else changes.group()[1:-1]
-
-                            if '\n' in status.output:
-                                status.output = status.output[status.output.
-                                                              index('\n') + 1:]
-                            elif status.output.startswith('  ##'):
-                                status.output = ''
-
-                            # use diff to work out which files have changed
-                            diff = self.git(rep, 'diff', diff_options)
-                            changed = ''
-                            if diff:
-                                changed = files_changed.search(diff.output)
-                                changed = '' if changed is None else 'uncommitted changes in ' + changed.groups()[0]
-
-                            debugging(f'changes = {changes}\nchanged={changed}\nstatus={status.output}')
-
-                            if changes != '':
-                                changed += changes if changed == '' else ', ' + changes
-
-                            if status.output != '':
-                                self.rep_message(
-                                    rep,
-                                    changed + '\n' + status.output,
-                                    quiet=False)
-                            elif changed != '':
-                                self.rep_message(rep, changed, quiet=False)
+            self.status_options = self.process_options('--porcelain=v2', '--branch')
+            if self.options.cached:
+                # a cached status can only be reused with the same options
+                self.status_cache_options = self.status_options + (['--local'] if self.options.local else [])
+                self.read_status_cache()
+            self.run_in_parallel(self.status_one)
+            if self.options.cached:
+                self.save_status_cache()
+
+    def status_one(self, rep):
+        r'''
+        Print a summary of the status of the repository `rep`
+        '''
+        debugging(f'\nSTATUS for {rep}')
+        dire = self.expand_path(rep)
+        if self.is_git_repository(dire):
+
+            # update with remote, unless local is true or the remotes were
+            # fetched recently
+            remote = (self.options.local
+                      or self.recently_fetched(dire)
+                      or self.git(rep, 'remote', 'update', capture=False))
+
+            if remote:
+                # reuse the cached status if git has not changed the repository
+                if self.options.cached:
+                    state = self.repository_state(dire)
+                    cached = self.status_cache.get(dire)
+                    if (state is not None and cached is not None and cached.get('state') == state
+                            and cached.get('options') == self.status_cache_options):
+                        self.rep_message(rep, cached['message'], quiet=cached['quiet'])
+                        return
+
+                # use status to work out relative changes and which files
+                # have changed. In porcelain v2 format, the ahead/behind counts
+                # are given on the line "# branch.ab +<ahead> -<behind>" and
+                # the changed files are on the lines starting with 1, 2 or u
+                status = self.git(rep, 'status', *self.status_options)
+                if status:
+                    changes = ''
+                    uncommitted = 0
+                    files = []
+                    for line in status.stdout.splitlines():
+                        if line.startswith('# branch.ab '):
+                            ahead, behind = (int(n[1:]) for n in line.split()[2:4])
+                            changes = ', '.join(f'{change} {n}' for change, n in
+                                                [('ahead', ahead), ('behind', behind)] if n > 0)
+                        elif line.startswith(('1 ', '2 ', 'u ')):
+                            # the number of fields before the path depends on the type of change
+                            fields = line.split(' ', {'1': 8, '2': 9, 'u': 10}[line[0]])
+                            xy = fields[1].replace('.', ' ')
+                            if xy[1] != ' ':
+                                uncommitted += 1
+                            if line[0] == '2':
+                                path, original = fields[-1].split('\t')
+                                files.append(f'{xy} {original} -> {path}'.lstrip())
                             else:
-                                self.rep_message(rep, 'up to date')
+                                files.append(f'{xy} {fields[-1]}'.lstrip())
+                        elif line.startswith(('? ', '! ')):
+                            files.append(f'{line[0]*2} {line[2:]}')
+                    status.output = '\n'.join('  ' + file for file in files)
 
-                else:
-                    self.rep_message(rep, 'not on system')
+                    changed = ''
+                    if uncommitted > 0:
+                        changed = f'uncommitted changes in {uncommitted} file' + ('s' if uncommitted > 1 else '')
+
+                    if Settings.DEBUGGING:
+                        debugging(f'changes = {changes}\nchanged={changed}\nstatus={status.output}')
+
+                    if changes != '':
+                        changed += changes if changed == '' else ', ' + changes
+
+                    if status.output != '':
+                        message, quiet = changed + '\n' + status.output, False
+                    elif changed != '':
+                        message, quiet = changed, False
+                    else:
+                        message, quiet = 'up to date', True
+                    self.rep_message(rep, message, quiet=quiet)
+
+                    if self.options.cached:
+                        self.status_cache[dire] = dict(
+                            state=self.repository_state(dire),
+                            options=self.status_cache_options,
+                            message=message,
+                            quiet=quiet)
+
+        else:
+            self.rep_message(rep, 'not on system')
+
+    def tune(self):
+        r'''
+        Make later git commands faster in the selected repositories by packing
+        their refs and writing a commit-graph file. The repositories are also
+        configured so that `git gc` keeps the commit-graph up to date. This
+        only needs to be done once, although running it again is harmless.
+
+        Example:
+            > git cat tune Code
+            Code/Project1  tuned
+            Code/Project2  tuned
+            Code/Project3  not on system
+        '''
+        self.run_in_parallel(self.tune_one)
+
+    def tune_one(self, rep):
+        r'''
+        Pack the refs of the repository `rep` and write its commit-graph
+        '''
+        debugging('\nTUNING ' + rep)
+        dire = self.expand_path(rep)
+        if self.is_git_repository(dire):
+            if (self.git(rep, 'config', 'core.commitGraph', 'true', capture=False)
+                and self.git(rep, 'config', 'gc.writeCommitGraph', 'true', capture=False)
+                and self.git(rep, 'commit-graph', 'write', '--reachable', capture=False)
+                and self.git(rep, 'pack-refs', '--all', capture=False)):
+                self.rep_message(rep, 'tuned')
+        else:
+            self.rep_message(rep, 'not on system')
 
 
 # ---------------------------------------------------------------------------
@@ -1382,11 +1851,26 @@ class GitCatHelpFormatter(argparse.HelpFormatter):
 
 
 # ---------------------------------------------------------------------------
-def setup_command_line_parser(settings):
+def positive_int(value):
+    r'''
+    Return `value` as an integer, raising an argparse error unless it is a
+    positive integer. This is used to check the number of parallel jobs.
+    '''
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'{value} is not a positive integer')
+    return number
+
+
+def setup_command_line_parser(settings, command=None):
     '''
     Return parsers for the command line options and the commands.
     The function is used to parse the command-line options and to
-    automatically generate the documentation from setup.py
+    automatically generate the documentation from setup.py. If `command`
+    is given then only the parser for this command is generated.
     '''
     # set parse the command line options using argparse
     parser = argparse.ArgumentParser(
@@ -1403,8 +1887,8 @@ def setup_command_line_parser(settings):
         '-c',
         '--catalogue',
         type=str,
-        default=settings.rc_file,
-        help=f'specify the catalogue of git repositories (default: {settings.rc_file})')
+        default=None,
+        help='specify the catalogue of git repositories (default: $XDG_CONFIG_HOME/config/gitcatrc or ~/.gitcatrc)')
     parser.add_argument(
         '-p',
         '--prefix',
@@ -1417,6 +1901,13 @@ def setup_command_line_parser(settings):
         action='store_true',
         default=settings.quiet,
         help='Print messages only if repository changes')
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        type=positive_int,
+        default=MAX_WORKERS,
+        help=('Number of repositories to process in parallel '
+              '(default: twice the number of CPUs, at most 32)'))
 
     # parser.add_argument(
     #     '-s',
@@ -1462,19 +1953,46 @@ def setup_command_line_parser(settings):
         title='Commands',
         help='Subcommand to run',
         dest='command')
-    settings.add_git_options(commands)
+    settings.add_git_options(commands, command)
     parser._optionals.title = 'Optional arguments'
     return parser, commands
 
+# global options that take a value
+valued_options = ['-c', '--catalogue', '-p', '--prefix', '-j', '--jobs', '-m', '--moveto']
+
+def requested_command(args):
+    r'''
+    Return the git cat command given in the command line arguments `args`,
+    or `None` if no command is given, the command is unknown or help is
+    requested before the command.
+    '''
+    args = iter(args)
+    for arg in args:
+        if arg in valued_options:
+            next(args, None)
+        elif arg == '--help' or arg.startswith('-h'):
+            return None
+        elif not arg.startswith('-'):
+            return get_settings().command(arg)
+    return None
+
 def main():
     r'''
-    Parse command line options and then run git cat
+    Parse command line options and then run git cat. To reduce the start up
+    time, only the parser for the requested command is generated when
+    possible.
     '''
-    parser, commands = setup_command_line_parser(settings)
+    settings = get_settings()
+    if sys.argv[1:] in (['-v'], ['--version']):
+        # no need to build the parsers just to print the version
+        print(settings.version())
+        sys.exit()
+
+    parser, commands = setup_command_line_parser(settings, requested_command(sys.argv[1:]))
     if argcomplete:
         argcomplete.autocomplete(parser)
     options = parser.parse_args()
-    settings.DEBUGGING = options.debugging
+    Settings.DEBUGGING = options.debugging
 
     if options.help > 0:
         parser.print_help()
@@ -1485,7 +2003,7 @@ def main():
 
 
         if options.help > 2:
-            for cmd in commands.choices:
+            for cmd in settings.commands:
                 print('{}\n{}'.format(cmd, '-'*len(cmd)))
                 commands.choices[cmd].print_help()
                 print()